@@ -3,6 +3,7 @@ Configuration file for AirFly Insights project.
 Contains paths, constants, and data type mappings for memory optimization.
 """
 
+import functools
 import os
 from pathlib import Path
 
@@ -20,12 +21,16 @@ OUTPUT_DIR = PROJECT_ROOT / "outputs"
 FIGURES_DIR = OUTPUT_DIR / "figures"
 REPORTS_DIR = OUTPUT_DIR / "reports"
 
-# Ensure directories exist
-for directory in [RAW_DATA_DIR, PROCESSED_DATA_DIR, SAMPLES_DATA_DIR, FIGURES_DIR, REPORTS_DIR]:
+
+@functools.lru_cache(maxsize=None)
+def ensure_dir(directory: Path) -> Path:
+    """Create a directory on first use (once per process) and return it."""
     directory.mkdir(parents=True, exist_ok=True)
+    return directory
+
 
 # Data loading parameters
-CHUNK_SIZE = 100000  # Number of rows to read at a time
+CSV_BLOCK_SIZE = 8 << 20  # Bytes parsed per block when streaming CSV with Arrow
 SAMPLE_SIZE = 1000000  # Number of rows for initial sampling
 RANDOM_STATE = 42  # For reproducibility
 
@@ -49,6 +54,9 @@ DTYPE_MAPPINGS = {
     }
 }
 
+# Frames with at least this many rows convert dtypes on a thread pool
+PARALLEL_DTYPE_MIN_ROWS = 100000
+
 # Key Status Values
 FLIGHT_STATUS_VALUES = ['On Time', 'Delayed', 'Cancelled']
 
@@ -95,6 +103,8 @@ PERIOD_ORDER = ['Morning', 'Afternoon', 'Evening', 'Night']
 # Month name order
 MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
                'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+MONTH_FULL_NAMES = ['January', 'February', 'March', 'April', 'May', 'June',
+                    'July', 'August', 'September', 'October', 'November', 'December']
 
 # Day name order
 DAY_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
@@ -6,78 +6,294 @@ Provides functions for loading, sampling, and optimizing airline data.
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from typing import Optional, List, Dict, Union
+from typing import Optional, List, Dict, Tuple, Union
 from tqdm import tqdm
+import hashlib
+import json
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
 
 from src.config import (
     RAW_DATA_DIR, PROCESSED_DATA_DIR, SAMPLES_DATA_DIR,
-    CHUNK_SIZE, SAMPLE_SIZE, RANDOM_STATE, DTYPE_MAPPINGS,
+    CSV_BLOCK_SIZE, SAMPLE_SIZE, RANDOM_STATE, DTYPE_MAPPINGS,
+    PARALLEL_DTYPE_MIN_ROWS, ensure_dir,
     DELAY_COLUMNS
 )
 
+# Column -> pandas dtype for optimize_dataframe_dtypes, built once at import
+_DTYPE_MAP = {
+    **{col: 'category' for col in DTYPE_MAPPINGS['categorical']},
+    **DTYPE_MAPPINGS['integer']
+}
+
+# Version of the CSV -> Parquet parsing semantics baked into load_data_chunked's
+# cache key; bump whenever parse/convert options change (2: empty strings -> null)
+_CACHE_FORMAT_VERSION = 2
+
+
+def _arrow_column_types() -> Dict[str, pa.DataType]:
+    """
+    Build Arrow column types from DTYPE_MAPPINGS so dtypes are applied during parsing.
+    
+    Returns:
+    --------
+    dict
+        Column name -> Arrow data type
+    """
+    column_types = {col: pa.dictionary(pa.int32(), pa.string()) for col in DTYPE_MAPPINGS['categorical']}
+    column_types.update({
+        col: pa.from_numpy_dtype(np.dtype(dtype))
+        for col, dtype in DTYPE_MAPPINGS['integer'].items()
+    })
+    return column_types
+
+
+def _arrow_types_mapper(arrow_type: pa.DataType):
+    """Map Arrow types to pandas dtypes, keeping dictionary columns as pd.Categorical."""
+    if pa.types.is_dictionary(arrow_type):
+        return None
+    return pd.ArrowDtype(arrow_type)
+
+
+def _arrow_convert_options(optimize_dtypes: bool = True) -> pcsv.ConvertOptions:
+    """
+    Build Arrow CSV convert options matching pd.read_csv null handling.
+    
+    Empty (and empty quoted) cells in string and dictionary columns become
+    nulls rather than the '' value.
+    """
+    return pcsv.ConvertOptions(
+        column_types=_arrow_column_types() if optimize_dtypes else None,
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=True
+    )
+
+
+def _stream_csv_to_parquet(
+    filepath: Path,
+    parquet_path: Path,
+    block_size: int,
+    nrows: Optional[int],
+    optimize_dtypes: bool
+) -> None:
+    """Stream CSV blocks into a Parquet file, replacing it only once fully written."""
+    ensure_dir(parquet_path.parent)
+    tmp_path = parquet_path.with_name(parquet_path.name + '.tmp')
+    
+    read_options = pcsv.ReadOptions(block_size=block_size, use_threads=True)
+    convert_options = _arrow_convert_options(optimize_dtypes)
+    
+    try:
+        try:
+            total_rows = 0
+            
+            with pcsv.open_csv(filepath, read_options=read_options, convert_options=convert_options) as reader:
+                with pq.ParquetWriter(tmp_path, reader.schema) as writer:
+                    for batch in tqdm(reader, desc="Loading chunks"):
+                        if nrows:
+                            batch = batch.slice(0, nrows - total_rows)
+                        writer.write_batch(batch)
+                        total_rows += batch.num_rows
+                        
+                        if nrows and total_rows >= nrows:
+                            break
+        except pa.ArrowInvalid as e:
+            # The streaming reader infers types from the first block only; a later
+            # block that doesn't fit (e.g. ints then floats) needs a whole-file parse
+            warnings.warn(f"Could not stream {filepath.name} ({e}); re-parsing without streaming")
+            table = pcsv.read_csv(filepath, read_options=read_options, convert_options=convert_options)
+            if nrows:
+                table = table.slice(0, nrows)
+            pq.write_table(table, tmp_path)
+        
+        tmp_path.replace(parquet_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
 
 def load_data_chunked(
     filepath: Union[str, Path],
-    chunksize: int = CHUNK_SIZE,
+    *,
+    block_size: int = CSV_BLOCK_SIZE,
     nrows: Optional[int] = None,
-    optimize_dtypes: bool = True
+    optimize_dtypes: bool = True,
+    parquet_path: Optional[Union[str, Path]] = None,
+    use_cache: bool = True
 ) -> pd.DataFrame:
     """
-    Load large CSV file in chunks to manage memory.
+    Stream a large CSV file in blocks into a Parquet file to manage memory.
+    
+    Blocks are parsed by Arrow's multithreaded CSV reader and written straight
+    to Parquet, so no list of chunks is held in memory and no concat copy is made.
+    By default the Parquet file doubles as a cache keyed by the CSV's path,
+    mtime and size plus DTYPE_MAPPINGS, so unchanged files skip parsing entirely.
     
     Parameters:
     -----------
     filepath : str or Path
         Path to the CSV file
-    chunksize : int
-        Number of rows to read per chunk
+    block_size : int
+        Number of bytes (not rows) to parse per block; keyword-only so old
+        positional row-count `chunksize` calls fail loudly
     nrows : int, optional
         Total number of rows to read (None = all rows)
     optimize_dtypes : bool
-        Whether to apply memory optimization
+        Whether to apply DTYPE_MAPPINGS while parsing
+    parquet_path : str or Path, optional
+        Where to write the streamed Parquet file (always re-written).
+        Defaults to a cache file PROCESSED_DATA_DIR / _cache_<path key>_<key>.parquet,
+        replacing any older cache file for the same CSV path
+    use_cache : bool
+        Whether to reuse a matching cache file instead of re-parsing the CSV
         
     Returns:
     --------
     pd.DataFrame
-        Loaded and optionally optimized dataframe
+        Loaded dataframe (Arrow-backed columns, categoricals as pd.Categorical)
     """
     filepath = Path(filepath)
     
     if not filepath.exists():
         raise FileNotFoundError(f"File not found: {filepath}")
     
-    print(f"Loading data from: {filepath.name}")
+    cached = False
+    stale_caches = []
+    if parquet_path is None:
+        # Cache named by the source path, then by the cache format version, the file's
+        # identity, the dtype mappings and the load options; one cache file per source path
+        stat = filepath.stat()
+        path_key = hashlib.blake2b(str(filepath.resolve()).encode()).hexdigest()[:16]
+        key_source = "|".join([
+            str(_CACHE_FORMAT_VERSION), str(stat.st_mtime_ns), str(stat.st_size),
+            json.dumps(DTYPE_MAPPINGS, sort_keys=True), str(nrows), str(optimize_dtypes)
+        ])
+        key = hashlib.blake2b(key_source.encode()).hexdigest()[:16]
+        parquet_path = PROCESSED_DATA_DIR / f"_cache_{path_key}_{key}.parquet"
+        cached = use_cache and parquet_path.exists()
+        stale_caches = [
+            path for path in PROCESSED_DATA_DIR.glob(f"_cache_{path_key}_*.parquet")
+            if path != parquet_path
+        ]
+    parquet_path = Path(parquet_path)
+    
+    if cached:
+        print(f"Loading cached data for: {filepath.name}")
+    else:
+        print(f"Loading data from: {filepath.name}")
+        _stream_csv_to_parquet(filepath, parquet_path, block_size, nrows, optimize_dtypes)
+        
+        # Drop caches from older versions of the same source file
+        for path in stale_caches:
+            path.unlink(missing_ok=True)
     
-    # Read in chunks
-    chunks = []
-    total_rows = 0
+    df = pq.read_table(parquet_path).to_pandas(types_mapper=_arrow_types_mapper)
     
-    with pd.read_csv(filepath, chunksize=chunksize) as reader:
-        for chunk in tqdm(reader, desc="Loading chunks"):
-            if optimize_dtypes:
-                chunk = optimize_dataframe_dtypes(chunk)
-            chunks.append(chunk)
-            total_rows += len(chunk)
-            
-            if nrows and total_rows >= nrows:
-                break
+    print(f"Loaded {len(df):,} rows with {len(df.columns)} columns")
     
-    df = pd.concat(chunks, ignore_index=True)
+    return df
+
+
+def build_read_csv_kwargs() -> Dict:
+    """
+    Build keyword arguments for pd.read_csv that apply DTYPE_MAPPINGS at parse time.
     
-    if nrows:
-        df = df.head(nrows)
+    Strings in categorical columns are parsed straight into category codes and
+    pandas skips its type-inference pass.
     
-    print(f"Loaded {len(df):,} rows with {len(df.columns)} columns")
+    Returns:
+    --------
+    dict
+        Keyword arguments for pd.read_csv
+    """
+    # Nullable integer dtypes (e.g. 'Int8') so a missing value doesn't abort the parse
+    nullable_integers = {
+        col: dtype.replace('uint', 'UInt', 1) if dtype.startswith('uint') else dtype.replace('int', 'Int', 1)
+        for col, dtype in DTYPE_MAPPINGS['integer'].items()
+    }
     
-    return df
+    return {
+        'dtype': {**_DTYPE_MAP, **nullable_integers},
+        'engine': 'c',
+        'low_memory': False
+    }
+
+
+def _estimate_row_count(filepath: Path, sniff_rows: int = 1000) -> float:
+    """
+    Estimate the number of data rows in a CSV file without reading all of it.
+    
+    Uses the file size divided by the average byte length of the first
+    `sniff_rows` lines after the header.
+    
+    Returns:
+    --------
+    float
+        Estimated row count
+    """
+    with open(filepath, 'rb') as f:
+        header = f.readline()
+        sample = [line for line in (f.readline() for _ in range(sniff_rows)) if line]
+    
+    if not sample:
+        return 0.0
+    
+    avg_row_bytes = sum(map(len, sample)) / len(sample)
+    return (filepath.stat().st_size - len(header)) / avg_row_bytes
+
+
+def _reservoir_sample_csv(
+    filepath: Path,
+    sample_size: int,
+    rng: np.random.Generator,
+    keep_prob: float = 1.0,
+    **csv_options
+) -> Tuple[pa.Table, int]:
+    """
+    Sample rows uniformly from a CSV file one Arrow batch at a time.
+    
+    Every row gets a random key and the rows with the `sample_size` smallest
+    keys are kept, so at most one batch plus the reservoir is held in memory.
+    Rows with a key >= `keep_prob` are dropped before merging; this is exact
+    as long as at least `sample_size` rows pass the filter.
+    
+    Returns:
+    --------
+    tuple
+        (sampled rows in file order, number of rows read from the file)
+    """
+    keys = np.empty(0)
+    rows_seen = 0
+    
+    with pcsv.open_csv(filepath, **csv_options) as reader:
+        # Start empty so a header-only file still yields a (zero-row) table
+        reservoir = reader.schema.empty_table()
+        
+        for batch in tqdm(reader, desc="Sampling batches"):
+            rows_seen += batch.num_rows
+            batch_keys = rng.random(batch.num_rows)
+            passed = batch_keys < keep_prob
+            batch_table = pa.Table.from_batches([batch]).filter(pa.array(passed))
+            reservoir = pa.concat_tables([reservoir, batch_table])
+            keys = np.concatenate([keys, batch_keys[passed]])
+            
+            if len(keys) > sample_size:
+                keep = np.sort(np.argpartition(keys, sample_size)[:sample_size])
+                reservoir = reservoir.take(pa.array(keep))
+                keys = keys[keep]
+    
+    return reservoir, rows_seen
 
 
 def load_sample_data(
     filepath: Union[str, Path],
     sample_size: int = SAMPLE_SIZE,
     random_state: int = RANDOM_STATE,
-    stratify_by: Optional[str] = None
+    stratify_by: Optional[str] = None,
+    low_memory: bool = False
 ) -> pd.DataFrame:
     """
     Load a random sample of data for quick exploration.
@@ -92,6 +308,9 @@ def load_sample_data(
         Random seed for reproducibility
     stratify_by : str, optional
         Column name to stratify sampling by
+    low_memory : bool
+        Whether to reservoir-sample batch by batch instead of reading
+        the whole file into memory first
         
     Returns:
     --------
@@ -102,67 +321,132 @@ def load_sample_data(
     
     print(f"Loading sample of {sample_size:,} rows from: {filepath.name}")
     
-    # First, get total row count
-    with open(filepath, 'r', encoding='ISO-8859-1') as f:
-        total_rows = sum(1 for _ in f) - 1  # Subtract header
-    
-    print(f"Total rows in file: {total_rows:,}")
-    
-    # Calculate skip probability
-    skip_prob = 1 - (sample_size / total_rows)
-    
-    # Random sampling
-    df = pd.read_csv(
-        filepath,
-        skiprows=lambda i: i > 0 and np.random.random() > (1 - skip_prob),
-        encoding='ISO-8859-1',
-        on_bad_lines='skip'
-    )
-    
-    # Ensure we have approximately the right sample size
-    if len(df) > sample_size:
-        df = df.sample(n=sample_size, random_state=random_state)
+    csv_options = {
+        'read_options': pcsv.ReadOptions(block_size=64 << 20, encoding='ISO-8859-1'),
+        'parse_options': pcsv.ParseOptions(invalid_row_handler=lambda row: 'skip'),
+        'convert_options': _arrow_convert_options()
+    }
+    rng = np.random.default_rng(random_state)
+    
+    table = None
+    
+    if low_memory:
+        try:
+            # Pre-filter batches using an estimated row count, oversampled by 10%
+            # plus a few standard deviations so small samples still fill up
+            est_rows = _estimate_row_count(filepath)
+            print(f"Estimated rows in file: {est_rows:,.0f}")
+            target = 1.1 * sample_size + 5 * np.sqrt(sample_size)
+            keep_prob = min(1.0, target / est_rows) if est_rows else 1.0
+            table, rows_seen = _reservoir_sample_csv(filepath, sample_size, rng, keep_prob=keep_prob, **csv_options)
+            print(f"Total rows in file: {rows_seen:,}")
+            
+            if keep_prob < 1.0 and table.num_rows < min(sample_size, rows_seen):
+                # The estimate overshot the real row count; redo the pass without pre-filtering
+                warnings.warn(f"Row estimate for {filepath.name} was too high "
+                              f"({table.num_rows:,} of {sample_size:,} rows sampled); resampling")
+                table, _ = _reservoir_sample_csv(filepath, sample_size, rng, **csv_options)
+        except pa.ArrowInvalid as e:
+            # The streaming reader infers types from the first block only; a later
+            # block that doesn't fit (e.g. ints then floats) needs a whole-file parse
+            warnings.warn(f"Could not stream {filepath.name} ({e}); sampling from a whole-file parse")
+            table = None
+    
+    if table is None:
+        table = pcsv.read_csv(filepath, **csv_options)
+        print(f"Total rows in file: {table.num_rows:,}")
+        
+        if table.num_rows > sample_size:
+            idx = np.sort(rng.choice(table.num_rows, sample_size, replace=False))
+            table = table.take(pa.array(idx))
     
-    df = optimize_dataframe_dtypes(df)
+    df = table.to_pandas(types_mapper=_arrow_types_mapper)
     
     print(f"Sampled {len(df):,} rows")
     
     return df
 
 
-def optimize_dataframe_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+def _convert_column(df: pd.DataFrame, col: str, dtype: str) -> Tuple[str, Optional[pd.Series]]:
+    """Convert one column, returning None (with a warning) if the conversion fails."""
+    try:
+        return col, df[col].astype(dtype)
+    except (ValueError, TypeError):
+        # If conversion fails, keep original dtype
+        warnings.warn(f"Could not convert {col} to {dtype}")
+        return col, None
+
+
+def optimize_dataframe_dtypes(
+    df: pd.DataFrame,
+    inplace: bool = False,
+    auto_downcast: bool = True
+) -> pd.DataFrame:
     """
     Optimize dataframe memory usage by converting to appropriate dtypes.
     
+    Only the targeted columns are re-allocated; untouched columns are shared
+    with the input frame rather than deep-copied.
+    
     Parameters:
     -----------
     df : pd.DataFrame
         Dataframe to optimize
+    inplace : bool
+        Whether to convert the columns of `df` directly instead of
+        returning a new frame
+    auto_downcast : bool
+        Whether to also downcast numeric columns not listed in DTYPE_MAPPINGS
+        (signed integers; floats only when float32 is exact) and convert
+        low-cardinality (< 50% unique) string columns to category
         
     Returns:
     --------
     pd.DataFrame
         Optimized dataframe
     """
-    df_optimized = df.copy()
+    mapping = {col: dtype for col, dtype in _DTYPE_MAP.items() if col in df.columns}
+    
+    if len(df) >= PARALLEL_DTYPE_MIN_ROWS and len(mapping) > 1:
+        # Per-column conversions are independent and run mostly in pandas' C code,
+        # so large frames convert their columns concurrently
+        with ThreadPoolExecutor() as executor:
+            results = list(executor.map(lambda item: _convert_column(df, *item), mapping.items()))
+        converted = {col: series for col, series in results if series is not None}
+    else:
+        try:
+            # Convert all mapped columns with a single astype dispatch
+            converted = dict(df[list(mapping)].astype(mapping).items())
+        except (ValueError, TypeError):
+            # Fall back to per-column conversion so one bad column doesn't block the rest
+            results = [_convert_column(df, col, dtype) for col, dtype in mapping.items()]
+            converted = {col: series for col, series in results if series is not None}
+    
+    # Adaptively downcast columns not covered by DTYPE_MAPPINGS
+    if auto_downcast and len(df) > 0:
+        remaining = df[[col for col in df.columns if col not in _DTYPE_MAP]]
+        
+        # Signed only: unsigned columns wrap around on subtraction (e.g. dep_time - sched_dep_time)
+        for col in remaining.select_dtypes(include=['int64', 'int32']).columns:
+            converted[col] = pd.to_numeric(df[col], downcast='integer')
+        
+        # Keep float32 only when it represents every value exactly
+        for col in remaining.select_dtypes(include='float64').columns:
+            downcast = pd.to_numeric(df[col], downcast='float')
+            if np.array_equal(downcast.to_numpy(dtype='float64'), df[col].to_numpy(), equal_nan=True):
+                converted[col] = downcast
+        
+        for col in remaining.select_dtypes(include=['object', 'string']).columns:
+            if df[col].nunique() / len(df) < 0.5:
+                converted[col] = df[col].astype('category')
     
-    # Convert categorical columns
-    for col in DTYPE_MAPPINGS['categorical']:
-        if col in df_optimized.columns:
-            # Check if it's already categorical
-            if not isinstance(df_optimized[col].dtype, pd.CategoricalDtype):
-                df_optimized[col] = df_optimized[col].astype('category')
+    if not inplace:
+        return df.assign(**converted)
     
-    # Convert integer columns
-    for col, dtype in DTYPE_MAPPINGS['integer'].items():
-        if col in df_optimized.columns:
-            try:
-                df_optimized[col] = df_optimized[col].astype(dtype)
-            except (ValueError, TypeError):
-                # If conversion fails, keep original dtype
-                warnings.warn(f"Could not convert {col} to {dtype}")
+    for col, series in converted.items():
+        df[col] = series
     
-    return df_optimized
+    return df
 
 
 def preprocess_data(df: pd.DataFrame) -> pd.DataFrame:
@@ -224,7 +508,14 @@ def get_memory_usage(df: pd.DataFrame, detailed: bool = False) -> Dict:
     dict
         Memory usage statistics
     """
-    total_mb = df.memory_usage(deep=True).sum() / 1024**2
+    # Fixed-width columns report exact sizes without a deep scan; only columns
+    # holding Python strings (or category labels) need to be walked
+    usage = df.memory_usage(deep=False)
+    deep_cols = df.select_dtypes(include=['object', 'string', 'category']).columns
+    if len(deep_cols) > 0:
+        usage.loc[deep_cols] = df[deep_cols].memory_usage(index=False, deep=True)
+    
+    total_mb = usage.sum() / 1024**2
     
     stats = {
         'total_mb': round(total_mb, 2),
@@ -234,7 +525,7 @@ def get_memory_usage(df: pd.DataFrame, detailed: bool = False) -> Dict:
     }
     
     if detailed:
-        column_usage = df.memory_usage(deep=True) / 1024**2
+        column_usage = usage / 1024**2
         stats['column_breakdown'] = column_usage.sort_values(ascending=False).to_dict()
     
     return stats
@@ -265,14 +556,22 @@ def save_processed_data(
     Path
         Path to saved file
     """
-    output_dir.mkdir(parents=True, exist_ok=True)
+    ensure_dir(Path(output_dir))
     
     if file_format == 'csv':
         filepath = output_dir / f"{filename}.csv"
         df.to_csv(filepath, index=False)
     elif file_format == 'parquet':
         filepath = output_dir / f"{filename}.parquet"
-        df.to_parquet(filepath, index=False)
+        # Dictionary-encoded strings round-trip as category dtype on reload
+        df.to_parquet(
+            filepath,
+            engine='pyarrow',
+            compression='snappy',
+            index=False,
+            use_dictionary=True,
+            row_group_size=256_000
+        )
     else:
         raise ValueError(f"Unsupported format: {file_format}")
     
@@ -295,13 +594,16 @@ def get_data_summary(df: pd.DataFrame) -> pd.DataFrame:
     pd.DataFrame
         Summary statistics
     """
+    # Count nulls once and derive non-null counts from them
+    nulls = df.isna().sum()
+    
     summary = pd.DataFrame({
         'dtype': df.dtypes,
-        'non_null': df.count(),
-        'null_count': df.isnull().sum(),
-        'null_pct': (df.isnull().sum() / len(df) * 100).round(2),
+        'non_null': len(df) - nulls,
+        'null_count': nulls,
+        'null_pct': (nulls / len(df) * 100).round(2),
         'unique': df.nunique(),
-        'memory_mb': df.memory_usage(deep=True) / 1024**2
+        'memory_mb': df.memory_usage(index=False, deep=True) / 1024**2
     })
     
     return summary.round(2)
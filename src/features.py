@@ -6,6 +6,8 @@ Provides functions for creating derived features like Month names, Day names, an
 import pandas as pd
 import numpy as np
 
+from src.config import MONTH_FULL_NAMES, DAY_ORDER
+
 def create_derived_features(df: pd.DataFrame) -> pd.DataFrame:
     """
     Create additional features for analysis.
@@ -18,29 +20,54 @@ def create_derived_features(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
     --------
     pd.DataFrame
-        Dataframe with new features
+        The same dataframe with the new feature columns added (the input is
+        modified in place rather than copied). MONTH and DAY_OF_WEEK are int8;
+        rows with an unparsed DEPARTURE_DATE get MONTH = 0 and DAY_OF_WEEK = -1.
     """
-    df_feat = df.copy()
-    
     # 1. Date-based features
-    if 'DEPARTURE_DATE' in df_feat.columns:
-        # Use nullable integer types (Int8) to handle potential NaT from parsing
-        df_feat['MONTH'] = df_feat['DEPARTURE_DATE'].dt.month.astype('Int8')
-        df_feat['MONTH_NAME'] = df_feat['DEPARTURE_DATE'].dt.month_name().astype('category')
-        df_feat['DAY_OF_WEEK'] = df_feat['DEPARTURE_DATE'].dt.dayofweek.astype('Int8')
-        df_feat['DAY_NAME'] = df_feat['DEPARTURE_DATE'].dt.day_name().astype('category')
+    if 'DEPARTURE_DATE' in df.columns:
+        # Derive month / weekday once from the day-resolution integers
+        days = df['DEPARTURE_DATE'].to_numpy('datetime64[D]')
+        missing = np.isnat(days)
+        month_idx = (days.astype('datetime64[M]').astype(np.int64) % 12).astype(np.int8)  # 0 = January
+        dow = ((days.astype(np.int64) - 4) % 7).astype(np.int8)  # 1970-01-01 was a Thursday; 0 = Monday
+        
+        # Plain int8 with sentinels for NaT from parsing (MONTH = 0, DAY_OF_WEEK = -1)
+        df['MONTH'] = np.where(missing, 0, month_idx + 1).astype(np.int8)
+        df['MONTH_NAME'] = pd.Categorical.from_codes(np.where(missing, -1, month_idx), categories=MONTH_FULL_NAMES)
+        df['DAY_OF_WEEK'] = np.where(missing, -1, dow).astype(np.int8)
+        df['DAY_NAME'] = pd.Categorical.from_codes(np.where(missing, -1, dow), categories=DAY_ORDER)
         
     # 2. Route Feature
-    if 'Airport Name' in df_feat.columns and 'Arrival Airport' in df_feat.columns:
-        df_feat['ROUTE'] = df_feat['Airport Name'].astype(str) + ' to ' + df_feat['Arrival Airport'].astype(str)
-        df_feat['ROUTE'] = df_feat['ROUTE'].astype('category')
+    if 'Airport Name' in df.columns and 'Arrival Airport' in df.columns:
+        # Combine category codes so only the unique routes are built as strings
+        origin = df['Airport Name'].astype('category')
+        dest = df['Arrival Airport'].astype('category')
+        origin_codes = origin.cat.codes.to_numpy().astype(np.int64)
+        dest_codes = dest.cat.codes.to_numpy().astype(np.int64)
+        n_dest = len(dest.cat.categories)
+        
+        missing = (origin_codes < 0) | (dest_codes < 0)
+        route_codes = origin_codes * n_dest + dest_codes
+        uniq, inverse = np.unique(route_codes[~missing], return_inverse=True)
+        
+        codes = np.full(len(df), -1, dtype=np.int64)
+        codes[~missing] = inverse
+        origin_labels = pd.Series(origin.cat.categories[uniq // n_dest], dtype='string')
+        dest_labels = pd.Series(dest.cat.categories[uniq % n_dest], dtype='string')
+        categories = origin_labels.str.cat(dest_labels, sep=' to ').to_numpy(dtype=object)
+        df['ROUTE'] = pd.Categorical.from_codes(codes, categories=categories)
         
     # 3. Age Groups (Optional but useful for this dataset)
-    if 'Age' in df_feat.columns:
-        bins = [0, 18, 35, 50, 65, 120]
+    if 'Age' in df.columns:
+        # Right-closed bins (0, 18], (18, 35], ..., (65, 120] as upper edges
+        upper_edges = np.array([18, 35, 50, 65, 120], dtype=np.int16)
         labels = ['0-18', '19-35', '36-50', '51-65', '65+']
-        df_feat['AGE_GROUP'] = pd.cut(df_feat['Age'], bins=bins, labels=labels).astype('category')
+        ages = df['Age'].to_numpy(dtype='float64', na_value=np.nan)
+        codes = np.searchsorted(upper_edges, ages, side='left').astype(np.int8)
+        codes[(ages <= 0) | (codes == len(labels)) | np.isnan(ages)] = -1
+        df['AGE_GROUP'] = pd.Categorical.from_codes(codes, categories=labels, ordered=True)
         
-    print(f"Created derived features for {len(df_feat):,} rows")
+    print(f"Created derived features for {len(df):,} rows")
     
-    return df_feat
+    return df
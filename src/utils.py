@@ -3,6 +3,7 @@ Utility functions for AirFly Insights project.
 Provides helper functions for data analysis and visualization.
 """
 
+import math
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -10,7 +11,82 @@ import seaborn as sns
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 
-from src.config import FIGURES_DIR, VIZ_STYLE, FIGURE_SIZE, DPI, COLOR_PALETTE
+from src.config import FIGURES_DIR, VIZ_STYLE, FIGURE_SIZE, DPI, COLOR_PALETTE, PERIOD_ORDER, ensure_dir
+
+# Optional: Numba for fused single-pass statistics kernels
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _iqr_mask(values, threshold):
+        """Flag values outside [Q1 - t*IQR, Q3 + t*IQR]; NaNs are never outliers."""
+        q1 = np.nanpercentile(values, 25)
+        q3 = np.nanpercentile(values, 75)
+        iqr = q3 - q1
+        lower = q1 - threshold * iqr
+        upper = q3 + threshold * iqr
+        out = np.empty(values.size, np.bool_)
+        for i in range(values.size):
+            out[i] = values[i] < lower or values[i] > upper
+        return out
+
+    @njit(cache=True)
+    def _zscore_mask(values, threshold):
+        """Flag values whose |z-score| exceeds the threshold (sample std, NaNs skipped)."""
+        # Welford's running mean / variance
+        n = 0
+        mean = 0.0
+        m2 = 0.0
+        for i in range(values.size):
+            x = values[i]
+            if not np.isnan(x):
+                n += 1
+                delta = x - mean
+                mean += delta / n
+                m2 += delta * (x - mean)
+        out = np.zeros(values.size, np.bool_)
+        if n < 2:
+            return out
+        std = np.sqrt(m2 / (n - 1))
+        if not std > 0:
+            return out
+        for i in range(values.size):
+            out[i] = abs(values[i] - mean) / std > threshold
+        return out
+
+    @njit(cache=True)
+    def _delay_stats(values, on_time_threshold, significant_threshold):
+        """Single pass over non-null delays: count, mean, M2, min, max and threshold counts."""
+        n = 0
+        mean = 0.0
+        m2 = 0.0
+        min_value = np.inf
+        max_value = -np.inf
+        on_time = 0
+        delayed = 0
+        significant = 0
+        for i in range(values.size):
+            x = values[i]
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+            if x < min_value:
+                min_value = x
+            if x > max_value:
+                max_value = x
+            if x <= on_time_threshold:
+                on_time += 1
+            else:
+                delayed += 1
+                if x > significant_threshold:
+                    significant += 1
+        return n, mean, m2, min_value, max_value, on_time, delayed, significant
 
 
 def setup_plotting_style():
@@ -42,7 +118,7 @@ def save_figure(fig, filename: str, output_dir: Path = FIGURES_DIR, tight: bool
     tight : bool
         Whether to use tight layout
     """
-    output_dir.mkdir(parents=True, exist_ok=True)
+    ensure_dir(Path(output_dir))
     filepath = output_dir / f"{filename}.png"
     
     if tight:
@@ -52,9 +128,13 @@ def save_figure(fig, filename: str, output_dir: Path = FIGURES_DIR, tight: bool
     print(f"Figure saved: {filepath}")
 
 
+_SUFFIXES = ('', 'K', 'M', 'B', 'T')
+_DIVISORS = (1, 1e3, 1e6, 1e9, 1e12)
+
+
 def format_large_number(num: float) -> str:
     """
-    Format large numbers with K, M, B suffixes.
+    Format large numbers with K, M, B, T suffixes.
     
     Parameters:
     -----------
@@ -66,14 +146,35 @@ def format_large_number(num: float) -> str:
     str
         Formatted string
     """
-    if num >= 1e9:
-        return f"{num/1e9:.1f}B"
-    elif num >= 1e6:
-        return f"{num/1e6:.1f}M"
-    elif num >= 1e3:
-        return f"{num/1e3:.1f}K"
-    else:
+    if not math.isfinite(num):
         return f"{num:.0f}"
+    i = min(len(_SUFFIXES) - 1, max(0, int(math.log10(abs(num) or 1)) // 3))
+    return f"{num / _DIVISORS[i]:.1f}{_SUFFIXES[i]}" if i else f"{num:.0f}"
+
+
+def format_large_numbers_vec(values) -> np.ndarray:
+    """
+    Format an array of numbers with K, M, B, T suffixes (e.g. for axis tick labels).
+    
+    Parameters:
+    -----------
+    values : array-like
+        Numbers to format
+        
+    Returns:
+    --------
+    np.ndarray
+        Formatted strings
+    """
+    values = np.asarray(values, dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        exponent = np.floor(np.log10(np.abs(values)))
+    idx = np.clip(np.nan_to_num(exponent, nan=0.0, posinf=0.0, neginf=0.0) // 3, 0, len(_SUFFIXES) - 1).astype(int)
+    scaled = values / np.asarray(_DIVISORS)[idx]
+    return np.array([
+        f"{v:.1f}{_SUFFIXES[i]}" if i else f"{v:.0f}"
+        for v, i in zip(scaled.tolist(), idx.tolist())
+    ])
 
 
 def calculate_percentiles(series: pd.Series, percentiles: List[float] = [25, 50, 75, 90, 95, 99]) -> pd.Series:
@@ -113,6 +214,11 @@ def identify_outliers(series: pd.Series, method: str = 'iqr', threshold: float =
     pd.Series
         Boolean series indicating outliers
     """
+    if NUMBA_AVAILABLE and method in ('iqr', 'zscore'):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        kernel = _iqr_mask if method == 'iqr' else _zscore_mask
+        return pd.Series(kernel(values, float(threshold)), index=series.index, name=series.name)
+    
     if method == 'iqr':
         Q1 = series.quantile(0.25)
         Q3 = series.quantile(0.75)
@@ -147,7 +253,16 @@ def create_summary_table(df: pd.DataFrame, group_by: str, agg_cols: List[str]) -
     pd.DataFrame
         Summary table
     """
-    summary = df.groupby(group_by)[agg_cols].agg(['count', 'mean', 'median', 'std', 'min', 'max'])
+    stats = ['count', 'mean', 'median', 'std', 'min', 'max']
+    
+    # observed=True skips empty categorical groups; sort the (small) result instead of the groupby
+    grouped = df.groupby(group_by, observed=True, sort=False)[agg_cols]
+    summary = grouped.agg(['count', 'mean', 'std', 'min', 'max'])
+    medians = grouped.median()
+    for col in agg_cols:
+        summary[(col, 'median')] = medians[col]
+    
+    summary = summary[[(col, stat) for col in agg_cols for stat in stats]].sort_index()
     return summary.round(2)
 
 
@@ -184,12 +299,18 @@ def get_top_n_categories(series: pd.Series, n: int = 10, include_other: bool = T
     Returns:
     --------
     pd.Series
-        Series with top N categories
+        Series with top N categories (categorical dtype when include_other=True)
     """
     top_n = series.value_counts().head(n).index
     
     if include_other:
-        return series.apply(lambda x: x if x in top_n else 'Other')
+        mask = series.isin(top_n)
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            # Reuse the existing category codes instead of re-hashing every string
+            if 'Other' not in series.cat.categories:
+                series = series.cat.add_categories(['Other'])
+            return series.where(mask, 'Other').cat.remove_unused_categories()
+        return series.where(mask, other='Other').astype('category')
     else:
         return series[series.isin(top_n)]
 
@@ -212,17 +333,33 @@ def calculate_delay_metrics(df: pd.DataFrame, delay_col: str = 'ARRIVAL_DELAY')
     """
     delays = df[delay_col].dropna()
     
+    if NUMBA_AVAILABLE and len(delays) > 0:
+        # One fused pass for moments/extremes/counts, plus a partition for the median
+        values = delays.to_numpy(dtype='float64')
+        n, mean_delay, m2, min_delay, max_delay, on_time, delayed, significant = _delay_stats(values, 15.0, 60.0)
+        median_delay = np.median(values)
+        std_delay = np.sqrt(m2 / (n - 1)) if n > 1 else np.nan
+    else:
+        mean_delay = delays.mean()
+        median_delay = delays.median()
+        std_delay = delays.std()
+        min_delay = delays.min()
+        max_delay = delays.max()
+        on_time = (delays <= 15).sum()
+        delayed = (delays > 15).sum()
+        significant = (delays > 60).sum()
+    
     metrics = {
         'total_flights': len(df),
         'flights_with_delay_data': len(delays),
-        'mean_delay': delays.mean(),
-        'median_delay': delays.median(),
-        'std_delay': delays.std(),
-        'min_delay': delays.min(),
-        'max_delay': delays.max(),
-        'on_time_pct': (delays <= 15).sum() / len(delays) * 100,
-        'delayed_pct': (delays > 15).sum() / len(delays) * 100,
-        'significantly_delayed_pct': (delays > 60).sum() / len(delays) * 100
+        'mean_delay': mean_delay,
+        'median_delay': median_delay,
+        'std_delay': std_delay,
+        'min_delay': min_delay,
+        'max_delay': max_delay,
+        'on_time_pct': on_time / len(delays) * 100,
+        'delayed_pct': delayed / len(delays) * 100,
+        'significantly_delayed_pct': significant / len(delays) * 100
     }
     
     return {k: round(v, 2) for k, v in metrics.items()}
@@ -250,20 +387,13 @@ def create_time_features(df: pd.DataFrame, time_col: str) -> pd.DataFrame:
     df[f'{time_col}_HOUR'] = df[time_col] // 100
     df[f'{time_col}_MINUTE'] = df[time_col] % 100
     
-    # Create time of day categories
-    def categorize_time(hour):
-        if pd.isna(hour):
-            return 'Unknown'
-        elif 5 <= hour < 12:
-            return 'Morning'
-        elif 12 <= hour < 17:
-            return 'Afternoon'
-        elif 17 <= hour < 21:
-            return 'Evening'
-        else:
-            return 'Night'
-    
-    df[f'{time_col}_PERIOD'] = df[f'{time_col}_HOUR'].apply(categorize_time)
+    # Create time of day categories: <5 Night, 5-12 Morning, 12-17 Afternoon, 17-21 Evening, >=21 Night
+    categories = PERIOD_ORDER + ['Unknown']
+    period_codes = np.array([3, 0, 1, 2, 3], dtype=np.int8)
+    hours = df[f'{time_col}_HOUR'].to_numpy(dtype='float64', na_value=np.nan)
+    codes = period_codes[np.digitize(hours, [5, 12, 17, 21])]
+    codes[np.isnan(hours)] = categories.index('Unknown')
+    df[f'{time_col}_PERIOD'] = pd.Categorical.from_codes(codes, categories=categories)
     
     return df
 